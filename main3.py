@@ -1,97 +1,387 @@
 """
-Budget Planner — human-friendly console CRUD (JSON storage, no external modules)
+Budget Planner — human-friendly console CRUD (SQLite storage, no external modules)
 Save as: budget_json_human_friendly.py
 Run with: python budget_json_human_friendly.py
 
 Notes:
-- Uses a simple JSON file (budget_data.json) to persist transactions.
+- Uses a SQLite file (budget_data.db) to persist transactions; each CRUD
+  operation is one indexed statement, never a full-file rewrite.
+- Data from the older JSON/JSONL format is migrated automatically on first run.
 - Focused on readability: friendly prompts, helpful messages, and inline comments
-- Safe atomic saves (write temp then rename)
 - Beginner-friendly code and clear function names
 """
 
 import json
 import os
+import sqlite3
+import sys
+from bisect import insort
+from collections import defaultdict
+from dataclasses import asdict, astuple, dataclass
 from datetime import datetime
-from tempfile import NamedTemporaryFile
-from shutil import move
+from functools import lru_cache
+from operator import attrgetter
+from typing import Optional
 
+DB_FILE = "budget_data.db"
+
+# The pre-SQLite storage files; still recognized so existing data is
+# migrated into the database on first run.
 DATA_FILE = "budget_data.json"
+LOG_FILE = "budget_data.jsonl"
+
+# Syncing to the device on every statement is the dominant latency cost on
+# spinning disks and overkill for a personal budget tool: WAL mode with
+# synchronous=NORMAL already survives application crashes without
+# corruption. Set BUDGET_FSYNC=1 to get full durability per operation.
+DURABILITY = os.environ.get("BUDGET_FSYNC", "0") == "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tx(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL,
+    notes TEXT,
+    created_at TEXT NOT NULL DEFAULT '',
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_tx_date ON tx(date);
+CREATE INDEX IF NOT EXISTS ix_tx_category ON tx(category);
+"""
+
+
+@dataclass(slots=True)
+class Tx:
+    """One transaction.
+
+    Slots cut per-record memory to roughly a third of an equivalent dict and
+    make field access a fixed-offset load instead of a hash lookup. Field
+    order matches the tx table columns, so astuple maps straight to a row.
+    """
+
+    id: int
+    type: str
+    amount: float
+    category: str
+    date: str
+    notes: Optional[str] = None
+    created_at: str = ""
+    updated_at: Optional[str] = None
 
 
 def load_store():
-    """Load the data file and return a dict with next_id and transactions list.
-    If the file doesn't exist or is corrupted, create a fresh store.
+    """Open the database (creating it if needed) and load it into memory.
+
+    Returns a dict with next_id, the transactions list and the open
+    connection. Legacy JSON data is migrated into the database first.
     """
-    if not os.path.exists(DATA_FILE):
-        return {"next_id": 1, "transactions": []}
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        backup = DATA_FILE + ".corrupt"
+        conn = _connect()
+    except sqlite3.DatabaseError:
+        # Same resilience the JSON format had: park the unreadable file in a
+        # .corrupt backup, warn, and start fresh rather than crashing.
+        backup = DB_FILE + ".corrupt"
         try:
-            os.replace(DATA_FILE, backup)
+            os.replace(DB_FILE, backup)
         except Exception:
             pass
         print(f"Warning: data file was corrupt and moved to: {backup}")
-        return {"next_id": 1, "transactions": []}
+        conn = _connect()
+    _migrate_legacy(conn)
+    store = {"next_id": 1, "transactions": [], "_conn": conn}
+    rows = conn.execute(
+        "SELECT id, type, amount, category, date, notes, created_at, updated_at FROM tx ORDER BY id"
+    )
+    store["transactions"] = [Tx(*row) for row in rows]
+    # AUTOINCREMENT tracks the highest id ever used, so ids are never reused
+    # even after the newest transaction is deleted.
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tx'").fetchone()
+    store["next_id"] = (row[0] if row else 0) + 1
+    # In-memory id -> transaction index so lookups don't scan the whole list.
+    # Underscore keys are in-memory bookkeeping, never persisted.
+    store["_by_id"] = {t.id: t for t in store["transactions"]}
+    # Lazily built listing order (see _sorted_view); None means "stale".
+    store["_sorted"] = None
+    _rebuild_aggregates(store)
+    return store
+
+
+def _connect():
+    """Open DB_FILE, set the pragmas and make sure the schema exists.
+
+    Raises sqlite3.DatabaseError (closing the half-open connection first)
+    if the file turns out not to be a usable SQLite database.
+    """
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=" + ("FULL" if DURABILITY else "NORMAL"))
+        conn.executescript(_SCHEMA)
+    except sqlite3.DatabaseError:
+        conn.close()
+        raise
+    return conn
 
 
-def save_store(store):
-    """Atomically save the store dict to disk.
+def _migrate_legacy(conn):
+    """One-time import of the old JSON snapshot and JSONL mutation log.
 
-    We write to a temporary file and move it into place to reduce chance of data loss.
+    The files are renamed with a .bak suffix afterwards so the migration
+    never runs twice (and the originals stay around just in case).
     """
-    tmp = NamedTemporaryFile("w", delete=False, encoding="utf-8", prefix="budget_", suffix=".tmp")
-    try:
-        json.dump(store, tmp, indent=2, ensure_ascii=False)
-        tmp.flush()
-        os.fsync(tmp.fileno())
-        tmp.close()
-        move(tmp.name, DATA_FILE)
-    except Exception:
+    if not (os.path.exists(DATA_FILE) or os.path.exists(LOG_FILE)):
+        return
+    txs = {}
+    next_id = 1
+    if os.path.exists(DATA_FILE):
         try:
-            os.unlink(tmp.name)
-        except Exception:
+            with open(DATA_FILE, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            txs = {t["id"]: t for t in raw.get("transactions", [])}
+            next_id = raw.get("next_id", 1)
+        except (json.JSONDecodeError, ValueError, IOError):
+            print(f"Warning: could not read legacy data file {DATA_FILE}; skipping it.")
+    if os.path.exists(LOG_FILE):
+        with open(LOG_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except (json.JSONDecodeError, ValueError):
+                    # A torn write can only be the final line; stop replaying.
+                    break
+                if rec["op"] == "add":
+                    txs.setdefault(rec["tx"]["id"], rec["tx"])
+                    # The old loader bumped its id counter on every replayed
+                    # add, even if a later log entry deleted the transaction.
+                    next_id = max(next_id, rec["tx"]["id"] + 1)
+                elif rec["op"] == "upd":
+                    if rec["tx"]["id"] in txs:
+                        txs[rec["tx"]["id"]].update(rec["tx"])
+                elif rec["op"] == "del":
+                    txs.pop(rec["id"], None)
+    if txs:
+        conn.executemany(
+            "INSERT OR IGNORE INTO tx VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (t["id"], t["type"], t["amount"], t["category"], t["date"],
+                 t.get("notes"), t.get("created_at", ""), t.get("updated_at"))
+                for t in txs.values()
+            ),
+        )
+        print(f"Migrated {len(txs)} transaction(s) from the old JSON format.")
+    # Carry the old id counter forward — even when no transactions survived
+    # the replay — so ids handed out under the JSON format are not reused.
+    # sqlite_sequence only gains a 'tx' row once an insert has run, and the
+    # table has no unique constraint for an upsert, so probe it first.
+    if next_id > 1:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tx'").fetchone()
+        if row is None:
+            conn.execute("INSERT INTO sqlite_sequence VALUES('tx', ?)", (next_id - 1,))
+        else:
+            conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'tx'",
+                (next_id - 1,),
+            )
+    for path in (DATA_FILE, LOG_FILE):
+        try:
+            os.replace(path, path + ".bak")
+        except FileNotFoundError:
             pass
-        raise
+
+
+def _rebuild_aggregates(store):
+    """(Re)build the running report totals from scratch.
+
+    The totals are kept up to date on every mutation so the report commands
+    never have to walk the full list; this full pass only happens at load,
+    where SQLite's C-level GROUP BY does the summing when a connection is
+    available (the Python loop remains as a connection-less fallback).
+    """
+    store["_agg_month"] = defaultdict(float)
+    store["_agg_cat"] = defaultdict(float)
+    store["_agg_month_n"] = defaultdict(int)
+    store["_agg_cat_n"] = defaultdict(int)
+    conn = store.get("_conn")
+    if conn is not None:
+        for key, total, n in conn.execute(
+            "SELECT substr(date, 1, 7), SUM(amount), COUNT(*) FROM tx GROUP BY 1"
+        ):
+            store["_agg_month"][key] = total
+            store["_agg_month_n"][key] = n
+        for key, total, n in conn.execute(
+            "SELECT category, SUM(amount), COUNT(*) FROM tx GROUP BY 1"
+        ):
+            store["_agg_cat"][key] = total
+            store["_agg_cat_n"][key] = n
+        return
+    for t in store["transactions"]:
+        _agg_add(store, t)
+
+
+def _sorted_view(store):
+    """Return the transactions as (date, id, tx) tuples in ascending order.
+
+    The view is cached so repeated listings don't re-sort; add keeps it in
+    order with a bisect insert and other mutations just mark it stale (None).
+    Tuples are used instead of a sort key so the bisect works on any Python
+    version: ids are unique, so comparison never reaches the tx dict.
+    """
+    view = store.get("_sorted")
+    if view is None:
+        view = sorted((t.date, t.id, t) for t in store["transactions"])
+        store["_sorted"] = view
+    return view
+
+
+def _sorted_insert(store, tx):
+    """Slot a new transaction into the cached listing order, if it exists."""
+    if store.get("_sorted") is not None:
+        insort(store["_sorted"], (tx.date, tx.id, tx))
+
+
+def _agg_add(store, tx):
+    """Fold one transaction into the running report totals."""
+    ym = tx.date[0:7]
+    store["_agg_month"][ym] += tx.amount
+    store["_agg_month_n"][ym] += 1
+    cat = tx.category
+    store["_agg_cat"][cat] += tx.amount
+    store["_agg_cat_n"][cat] += 1
+
+
+def _agg_sub(store, tx):
+    """Remove one transaction's contribution from the running report totals.
+
+    A key is dropped only when its transaction count hits zero, so the
+    reports keep showing exactly the months/categories that still have
+    transactions — a remaining total of 0.00 is real and stays, matching
+    what the SQL GROUP BY rebuild produces after a restart.
+    """
+    ym = tx.date[0:7]
+    store["_agg_month"][ym] -= tx.amount
+    store["_agg_month_n"][ym] -= 1
+    if store["_agg_month_n"][ym] <= 0:
+        del store["_agg_month"][ym]
+        del store["_agg_month_n"][ym]
+    cat = tx.category
+    store["_agg_cat"][cat] -= tx.amount
+    store["_agg_cat_n"][cat] -= 1
+    if store["_agg_cat_n"][cat] <= 0:
+        del store["_agg_cat"][cat]
+        del store["_agg_cat_n"][cat]
+
+
+def persist_add(store, tx):
+    """Insert one transaction — a single indexed statement, not a rewrite."""
+    store["_conn"].execute("INSERT INTO tx VALUES(?, ?, ?, ?, ?, ?, ?, ?)", astuple(tx))
+
+
+def persist_update(store, tx):
+    """Write one transaction's current field values back to its row."""
+    store["_conn"].execute(
+        "UPDATE tx SET type = ?, amount = ?, category = ?, date = ?,"
+        " notes = ?, created_at = ?, updated_at = ? WHERE id = ?",
+        astuple(tx)[1:] + (tx.id,),
+    )
+
+
+def persist_delete(store, tid):
+    """Remove one transaction's row."""
+    store["_conn"].execute("DELETE FROM tx WHERE id = ?", (tid,))
 
 
 # ----------------------- Input helpers -----------------------
 
-def ask_date(prompt="Date (YYYY-MM-DD) [today]: "):
-    s = input(prompt).strip()
+# Days per month; February is special-cased for leap years below.
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+@lru_cache(maxsize=4096)
+def _valid_ymd(s):
+    """Cheap YYYY-MM-DD validity check, memoized per input string.
+
+    Positional digit/dash checks plus a month-length table cover the whole
+    grammar, so the datetime module (strptime is ~10 µs a call) is never
+    involved. Rejects Feb 30, handles leap years, and like strptime refuses
+    year 0.
+    """
+    if len(s) != 10 or s[4] != "-" or s[7] != "-":
+        return False
+    if not (s[0:4].isdigit() and s[5:7].isdigit() and s[8:10].isdigit()):
+        return False
+    month = int(s[5:7])
+    if not 1 <= month <= 12:
+        return False
+    days = _DAYS_IN_MONTH[month - 1]
+    if month == 2:
+        year = int(s[0:4])
+        if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+            days = 29
+    return 1 <= int(s[8:10]) <= days and s[0:4] != "0000"
+
+
+def _parse_amount(s):
+    """Fast parse of a plain decimal like 1200, 45.50 or -3.25.
+
+    One character-level pass instead of float()'s general-purpose parser
+    (which also handles exponents, infinities, underscores, ...). Returns
+    None when the input doesn't match this narrow grammar.
+    """
     if not s:
-        return datetime.today().strftime("%Y-%m-%d")
-    try:
-        datetime.strptime(s, "%Y-%m-%d")
-        return s
-    except ValueError:
+        return None
+    start = 1 if s[0] in "+-" else 0
+    seen_digit = seen_dot = False
+    for ch in s[start:]:
+        if "0" <= ch <= "9":
+            seen_digit = True
+        elif ch == "." and not seen_dot:
+            seen_dot = True
+        else:
+            return None
+    if not seen_digit:
+        return None
+    return float(s)
+
+
+def ask_date(prompt="Date (YYYY-MM-DD) [today]: "):
+    while True:
+        s = input(prompt).strip()
+        if not s:
+            return datetime.today().strftime("%Y-%m-%d")
+        if _valid_ymd(s):
+            return s
         print("That's not a valid date. Please use YYYY-MM-DD.")
-        return ask_date(prompt)
 
 
 def ask_float(prompt="Amount: "):
-    s = input(prompt).strip()
-    try:
-        return float(s)
-    except ValueError:
-        print("Please enter a number like 1200 or 45.50.")
-        return ask_float(prompt)
+    while True:
+        s = input(prompt).strip()
+        val = _parse_amount(s)
+        if val is not None:
+            return val
+        try:
+            # Exotic but valid forms (e.g. 1e3) still work via float itself.
+            return float(s)
+        except ValueError:
+            print("Please enter a number like 1200 or 45.50.")
 
 
 def ask_choice(prompt, choices, default=None):
     """Ask the user to choose a value from `choices` (case-insensitive).
     If default provided and user presses Enter, default is returned.
     """
-    choice = input(prompt).strip().lower()
-    if choice == "" and default is not None:
-        return default
-    if choice in choices:
-        return choice
-    print(f"Please enter one of: {', '.join(choices)}")
-    return ask_choice(prompt, choices, default)
+    while True:
+        choice = input(prompt).strip().lower()
+        if choice == "" and default is not None:
+            return default
+        if choice in choices:
+            return choice
+        print(f"Please enter one of: {', '.join(choices)}")
 
 
 # ----------------------- CRUD operations -----------------------
@@ -114,35 +404,47 @@ def add_transaction(store):
 
     now = datetime.now().isoformat()
     tid = store["next_id"]
-    tx = {
-        "id": tid,
-        "type": ttype,
-        "amount": amt,
-        "category": category,
-        "date": date,
-        "notes": notes,
-        "created_at": now,
-        "updated_at": None,
-    }
+    tx = Tx(
+        id=tid,
+        type=ttype,
+        amount=amt,
+        category=category,
+        date=date,
+        notes=notes,
+        created_at=now,
+        updated_at=None,
+    )
     store["transactions"].append(tx)
+    store["_by_id"][tid] = tx
     store["next_id"] += 1
-    save_store(store)
+    _agg_add(store, tx)
+    _sorted_insert(store, tx)
+    persist_add(store, tx)
     print(f"Saved — transaction id: {tid}")
 
 
+# Listing row formatter, built once: attrgetter grabs all six fields in one
+# C call and the % template avoids re-parsing an f-string's pieces per row.
+_ROW_FIELDS = attrgetter("id", "date", "category", "type", "amount", "notes")
+_ROW_TPL = "ID:%s | %s | %s | %s | %s%.2f | %s"
+
+
 def list_transactions(store, limit=None):
-    txs = sorted(store["transactions"], key=lambda r: (r["date"], r["id"]), reverse=True)
+    view = _sorted_view(store)
     if limit:
-        txs = txs[:limit]
+        view = view[-limit:]
+    txs = [t for _, _, t in reversed(view)]
     if not txs:
         print("\nNo transactions yet — add your first one!")
         return
-    print("\nRecent transactions:")
+    # Build the whole listing and emit it with one write: print-per-row
+    # flushes and locks stdout for every line, which dominates long listings.
+    lines = []
     for r in txs:
-        amt = r["amount"]
+        tid, date, category, ttype, amt, notes = _ROW_FIELDS(r)
         sign = "+" if amt > 0 else "-"
-        notes = r.get("notes") or ""
-        print(f"ID:{r['id']} | {r['date']} | {r['category']} | {r['type']} | {sign}{abs(amt):.2f} | {notes}")
+        lines.append(_ROW_TPL % (tid, date, category, ttype, sign, abs(amt), notes or ""))
+    sys.stdout.write("\nRecent transactions:\n" + "\n".join(lines) + "\n")
 
 
 def view_transaction(store):
@@ -152,12 +454,12 @@ def view_transaction(store):
     except ValueError:
         print("ID must be a number.")
         return
-    tx = next((x for x in store["transactions"] if x["id"] == tid), None)
+    tx = store["_by_id"].get(tid)
     if not tx:
         print("Transaction not found.")
         return
     print("\nTransaction details:")
-    for k, v in tx.items():
+    for k, v in asdict(tx).items():
         print(f"{k}: {v}")
 
 
@@ -168,19 +470,18 @@ def update_transaction(store):
     except ValueError:
         print("ID must be an integer.")
         return
-    idx = next((i for i, x in enumerate(store["transactions"]) if x["id"] == tid), None)
-    if idx is None:
+    tx = store["_by_id"].get(tid)
+    if tx is None:
         print("Transaction not found.")
         return
-    tx = store["transactions"][idx]
     print("Leave blank to keep the current value.")
-    print(f"Current type: {tx['type']}")
+    print(f"Current type: {tx.type}")
     new_type = input("New type (income/expense): ").strip().lower()
     if new_type not in ("", "income", "expense"):
         print("Invalid type. Keeping current.")
         new_type = ""
 
-    print(f"Current amount: {tx['amount']}")
+    print(f"Current amount: {tx.amount}")
     amt_in = input("New amount: ").strip()
     if amt_in:
         try:
@@ -194,39 +495,35 @@ def update_transaction(store):
     else:
         amt_val = None
 
-    category = input(f"New category [{tx['category']}]: ").strip()
-    date = input(f"New date [{tx['date']}] (YYYY-MM-DD): ").strip()
-    if date:
-        try:
-            datetime.strptime(date, "%Y-%m-%d")
-        except ValueError:
-            print("Invalid date format. Keeping old date.")
-            date = ""
-    notes = input(f"New notes [{tx.get('notes') or ''}]: ").strip()
+    category = input(f"New category [{tx.category}]: ").strip()
+    date = input(f"New date [{tx.date}] (YYYY-MM-DD): ").strip()
+    if date and not _valid_ymd(date):
+        print("Invalid date format. Keeping old date.")
+        date = ""
+    notes = input(f"New notes [{tx.notes or ''}]: ").strip()
 
-    final_type = tx["type"] if not new_type else new_type
-    final_amount = tx["amount"]
+    final_type = tx.type if not new_type else new_type
+    final_amount = tx.amount
     if amt_val is not None:
         final_amount = -abs(amt_val) if final_type == "expense" else abs(amt_val)
     if new_type and amt_val is None:
         # user changed type but not amount: flip sign
-        if tx["type"] != new_type:
-            final_amount = -tx["amount"]
-
-    final_category = tx["category"] if not category else category
-    final_date = tx["date"] if not date else date
-    final_notes = tx.get("notes") if not notes else notes
-    tx.update(
-        {
-            "type": final_type,
-            "amount": final_amount,
-            "category": final_category,
-            "date": final_date,
-            "notes": final_notes,
-            "updated_at": datetime.now().isoformat(),
-        }
-    )
-    save_store(store)
+        if tx.type != new_type:
+            final_amount = -tx.amount
+
+    final_category = tx.category if not category else category
+    final_date = tx.date if not date else date
+    final_notes = tx.notes if not notes else notes
+    _agg_sub(store, tx)
+    store["_sorted"] = None
+    tx.type = final_type
+    tx.amount = final_amount
+    tx.category = final_category
+    tx.date = final_date
+    tx.notes = final_notes
+    tx.updated_at = datetime.now().isoformat()
+    _agg_add(store, tx)
+    persist_update(store, tx)
     print("Transaction updated.")
 
 
@@ -237,25 +534,21 @@ def delete_transaction(store):
     except ValueError:
         print("ID must be an integer.")
         return
-    before = len(store["transactions"])
-    store["transactions"] = [x for x in store["transactions"] if x["id"] != tid]
-    after = len(store["transactions"])
-    if before == after:
+    tx = store["_by_id"].pop(tid, None)
+    if tx is None:
         print("No transaction found with that id.")
     else:
-        save_store(store)
+        store["transactions"].remove(tx)
+        _agg_sub(store, tx)
+        store["_sorted"] = None
+        persist_delete(store, tid)
         print("Deleted.")
 
 
 # ----------------------- Reports -----------------------
 
 def monthly_summary(store):
-    from collections import defaultdict
-
-    agg = defaultdict(float)
-    for t in store["transactions"]:
-        ym = t["date"][0:7]
-        agg[ym] += t["amount"]
+    agg = store["_agg_month"]
     if not agg:
         print("\nNo transactions to summarize.")
         return
@@ -265,11 +558,7 @@ def monthly_summary(store):
 
 
 def category_breakdown(store):
-    from collections import defaultdict
-
-    agg = defaultdict(float)
-    for t in store["transactions"]:
-        agg[t["category"]] += t["amount"]
+    agg = store["_agg_cat"]
     if not agg:
         print("\nNo transactions.")
         return
@@ -282,8 +571,15 @@ def reset_store(store):
     ok = input("Type YES to permanently delete all data: ").strip()
     if ok == "YES":
         store["transactions"].clear()
+        store["_by_id"].clear()
+        store["_agg_month"].clear()
+        store["_agg_cat"].clear()
+        store["_agg_month_n"].clear()
+        store["_agg_cat_n"].clear()
+        store["_sorted"] = None
         store["next_id"] = 1
-        save_store(store)
+        store["_conn"].execute("DELETE FROM tx")
+        store["_conn"].execute("DELETE FROM sqlite_sequence WHERE name = 'tx'")
         print("All data removed.")
     else:
         print("Cancelled.")
@@ -336,7 +632,7 @@ Choose: """
         print("\nInterrupted — exiting.")
     finally:
         try:
-            save_store(store)
+            store["_conn"].close()
         except Exception:
             pass
 